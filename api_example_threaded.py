@@ -1,9 +1,14 @@
+import asyncio
 import logging
 import time
-from typing import Dict, List
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 logging.basicConfig(
     level=logging.INFO, 
@@ -13,6 +18,19 @@ logger = logging.getLogger(__name__)
 
 _base_url = "http://127.0.0.1:8000/v1"
 _token = "fake-jwt-token"
+_max_concurrent = 100
+
+# shared session so every call reuses pooled connections instead of a new tcp/tls handshake
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=0)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+_session.headers.update(
+    {
+        "Authorization": f"Bearer {_token}",
+        "Content-Type": "application/json",
+    }
+)
 
 """
 Example curl command
@@ -22,9 +40,19 @@ curl -X GET "http://127.0.0.1:8000/v1/devices" \
 """
 
 
-def get_all_devices(timeout: int = 1, retries: int = 3, pagination_max: int = 500) -> List[Dict]:
+def get_all_devices(
+    timeout: int = 1,
+    retries: int = 3,
+    pagination_max: int = 500,
+    limit: int = 20,
+    prefetch: int = 2,
+) -> List[Dict]:
     """
     Docstring for get_all_devices
+
+    the server's next_url decides what gets fetched. up to `prefetch` pages
+    ahead are requested speculatively by page number (no retries) and a
+    speculative result is only used when its url matches next_url
     
     :param timeout: Description
     :type timeout: int
@@ -32,27 +60,71 @@ def get_all_devices(timeout: int = 1, retries: int = 3, pagination_max: int = 50
     :type retries: int
     :param pagination_max: Description
     :type pagination_max: int
+    :param limit: Description
+    :type limit: int
+    :param prefetch: Description
+    :type prefetch: int
     :return: Description
     :rtype: List[Dict]
     """
     result = []
+    # next free slot in result, it is preallocated from the first page total
+    idx = 0
     pagination_count = 1
     
-    url = f"{_base_url}/devices"
-    while url:
-        r = call_api(url=url)
-        pagination_count+=1
-        if pagination_count >= pagination_max:
-            raise SystemError(f"get_all_devices|max pages hit: {pagination_count}")
-        result.extend(r.get("devices") or [])
-        if "next_url" in r.keys():
-            if r.get("next_url"):
-                url = f"{_base_url}{r.get("next_url")}"
-                continue
-            else:
+    def page_url(page: int) -> str:
+        return f"{_base_url}/devices?page={page}&limit={limit}"
+
+    tpe = ThreadPoolExecutor(max_workers=max(prefetch, 1))
+
+    def speculate(page: int) -> tuple:
+        # retries=0 so a page the server rejects fails fast instead of sleeping
+        return page_url(page), tpe.submit(call_api, url=page_url(page), retries=0)
+
+    try:
+        ahead = deque(speculate(page) for page in range(2, prefetch + 2))
+        next_speculative = prefetch + 2
+        r = call_api(url=page_url(1))
+        while True:
+            pagination_count+=1
+            if pagination_count >= pagination_max:
+                raise SystemError(f"get_all_devices|max pages hit: {pagination_count}")
+            if not result and (total := r.get("total")):
+                result = [None] * total
+            page = r.get("devices") or []
+            # slice assignment still grows the list if total was under reported
+            result[idx:idx + len(page)] = page
+            idx += len(page)
+            if not r.get("next_url"):
+                # last page, anything still in flight is past the end
                 break
-        else:
-            break
+            url = f"{_base_url}{r.get('next_url')}"
+            r = None
+            if ahead:
+                speculative_url, speculative = ahead.popleft()
+                if speculative_url == url:
+                    ahead.append(speculate(next_speculative))
+                    next_speculative += 1
+                    try:
+                        r = speculative.result()
+                    except (
+                        requests.exceptions.RequestException,
+                        orjson.JSONDecodeError,
+                    ):
+                        # fall back to a normal fetch with retries below
+                        r = None
+                else:
+                    # the server paginates differently than we guessed, stop guessing
+                    for _, speculative in ahead:
+                        speculative.cancel()
+                    ahead.clear()
+            if r is None:
+                r = call_api(url=url)
+    finally:
+        # dont wait on requests past the end or on the max pages error path
+        tpe.shutdown(wait=False, cancel_futures=True)
+    # drop unused slots if total was over reported
+    del result[idx:]
     return result
 
 
@@ -69,29 +141,25 @@ def call_api(url: str = "", timeout: int = 5, retries: int = 3) -> dict:
     :return: Description
     :rtype: dict
     """
-    token = "fake-jwt-token"
-    headers = {
-        "Authorization": f"Bearer {_token}",
-        "Content-Type": "application/json",
-    }
     for attempt in range(retries + 1):
         try:
-            logger.info(f"call_api|requests.get: {url}")
-            response = requests.get(url=url, headers=headers, timeout=timeout)
+            logger.info("call_api|requests.get: %s", url)
+            response = _session.get(url=url, timeout=timeout)
             
             response.raise_for_status()
             try:
-                response_json = response.json()
-            except requests.exceptions.JSONDecodeError as json_err:
+                # orjson parses the raw bytes, no separate utf-8 decode to str
+                response_json = orjson.loads(response.content)
+            except orjson.JSONDecodeError as json_err:
                 # here we expect valid json in the repsonse. Log and re-raise the error if not
-                logger.error(f"call_api|json decode error: {response.text}")
+                logger.error("call_api|json decode error: %s", response.text)
                 raise
             return response_json
-        except requests.exceptions.RequestException as err:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as err:
             if attempt < retries:
                 wait_time = 2**attempt
                 logger.warning(
-                    f"call_api|request failed:{err}. retrying in {wait_time}"
+                    "call_api|request failed:%s. retrying in %s", err, wait_time
                 )
                 # here we sleep as a backoff
                 time.sleep(wait_time)
@@ -117,31 +185,102 @@ def get_device_by_id(id: str = "") -> dict:
     return device_json
 
 
+async def call_api_async(
+    client: httpx.AsyncClient, url: str = "", timeout: int = 5, retries: int = 3
+) -> dict:
+    """
+    Docstring for call_api_async
+
+    async version of call_api, uses the passed in shared client
+
+    :param client: Description
+    :type client: httpx.AsyncClient
+    :param url: Description
+    :type url: str
+    :param timeout: Description
+    :type timeout: int
+    :param retries: Description
+    :type retries: int
+    :return: Description
+    :rtype: dict
+    """
+    for attempt in range(retries + 1):
+        try:
+            logger.info("call_api_async|client.get: %s", url)
+            response = await client.get(url=url, timeout=timeout)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as err:
+            if attempt < retries:
+                wait_time = 2**attempt
+                logger.warning(
+                    "call_api_async|request failed:%s. retrying in %s", err, wait_time
+                )
+                # here we sleep as a backoff without blocking the event loop
+                await asyncio.sleep(wait_time)
+            else:
+                logger.error("call_api_async|max retries")
+                raise
+
+
+async def get_devices_by_id_async(
+    ids: list = [], concurrent: int = _max_concurrent
+) -> List[Dict]:
+    """
+    Docstring for get_devices_by_id_async
+
+    one shared AsyncClient for all the requests, the semaphore caps the
+    in-flight requests so large fan-outs dont exhaust the connection pool
+
+    :param ids: Description
+    :type ids: list
+    :param concurrent: Description
+    :type concurrent: int
+    :return: Description
+    :rtype: List[Dict]
+    """
+    if not ids:
+        logger.error("get_devices_by_id_async|must input device ids")
+        raise ValueError("must input device ids")
+    logger.info("get_devices_by_id_async|start for ids count:%d", len(ids))
+    semaphore = asyncio.Semaphore(concurrent)
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    headers = {
+        "Authorization": f"Bearer {_token}",
+        "Content-Type": "application/json",
+    }
+    async with httpx.AsyncClient(limits=limits, headers=headers) as client:
+
+        async def worker(id: str) -> dict:
+            async with semaphore:
+                return await call_api_async(
+                    client=client, url=f"{_base_url}/devices/{id}"
+                )
+
+        results = await asyncio.gather(*[worker(str(i)) for i in ids])
+    logger.info("get_devices_by_id_async|done got ids count:%d", len(results))
+    if len(ids) != len(results):
+        logger.warning("get_devices_by_id_async|mismatch of results to input devices")
+    return results
+
+
 def get_devices_by_id_threaded(ids: list = []) -> List[Dict]:
     """
     Docstring for get_devices_by_id_threaded
+
+    sync wrapper around get_devices_by_id_async for callers that cant await
     
     :param ids: Description
     :type ids: list
     :return: Description
     :rtype: List[Dict]
     """
-    if not ids:
-        logger.error("get_devices_by_id_threaded|must input device ids")
-        raise ValueError("must input device ids")
-    logger.info(f"get_devices_by_id_threaded|start for ids count:{len(ids)}")
-    with ThreadPoolExecutor(max_workers=5) as tpe:
-        futures = [tpe.submit(get_device_by_id, id=str(i)) for i in ids]
-        results = [future.result() for future in futures]
-        logger.info(f"get_devices_by_id_threaded|done got ids count:{len(results)}")
-        if len(ids) != len(results):
-            logger.warning(f"get_devices_by_id_threaded|mismatch of results to input devices")
-        return results
+    return asyncio.run(get_devices_by_id_async(ids=ids))
 
 
 if __name__=="__main__":
     print(f"{get_all_devices()[0:20]}")
-    t = requests.get("http://127.0.0.1:8000/v1/devices/100", headers={'Authorization': 'Bearer fake-jwt-token'})
+    t = _session.get("http://127.0.0.1:8000/v1/devices/100")
     # test threaded get devices by id
     t2 = get_devices_by_id_threaded(ids=list(range(1,20)))
     print(f"threaded: {t2}")
@@ -12,22 +12,66 @@ import time
 from typing import Any, Dict, List
 
 import httpx
+import orjson
+
+try:
+    # optional, lets the shared client speak HTTP/2: pip install 'httpx[http2]'
+    import h2
+except ImportError:
+    h2 = None
 
 _base_url = "https://petstore3.swagger.io/api/v3"
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# shared client so keep-alive and tls sessions survive across retries and pages
+# it is bound to the event loop it was built on, see get_client
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it on first use.
+
+    HTTP/2 is only enabled when the h2 extra is installed. The client's
+    connections belong to the running event loop, so a new client is built
+    when called from a different loop (e.g. a second asyncio.run). The module
+    owns the client, call close_client() when done with it
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # a client left over from a finished loop cant be aclose()d, just drop it
+        _client_loop = loop
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+            http2=h2 is not None,
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared AsyncClient if it was opened."""
+    global _client, _client_loop
+    if _client is not None:
+        if _client_loop is asyncio.get_running_loop():
+            await _client.aclose()
+        _client = None
+        _client_loop = None
+
 
 async def get_pet_by_id(
     id: str = "",
     timeout: int = 1,
     retries: int = 3,
+    client: httpx.AsyncClient | None = None,
 ) -> dict[str, Any]:
     """Fetch a pet by ID and return a single result dict.
 
     Retries up to `retries` times on network / HTTP errors, then raises
-    RuntimeError if all attempts fail.
+    RuntimeError if all attempts fail. Pass in `client` to share one
+    connection pool across many calls, defaults to the module client.
 
     curl -X 'GET' \
       'https://petstore3.swagger.io/api/v3/pet/10' \
@@ -39,45 +83,52 @@ async def get_pet_by_id(
         raise ValueError("get_pet_by_id|invalid id")
 
     api_url = f"{_base_url}/pet/{id}"
+    if client is None:
+        client = get_client()
 
     # define response dict
     result = {"response": None, "status_code": None, "error": None, "id": id}
 
     for retry in range(retries):
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url=api_url, timeout=timeout)
-                result["status_code"] = response.status_code
-                # if the pet id is not found we get a http 404
-                # include any other http codes we want to skip the retry on here
-                if response.status_code not in [404]:
-                    response.raise_for_status()
-                    response_json = response.json()
-                    result["response"] = response_json
-                logger.info("get_pet_by_id|done")
-                return result
+            response = await client.get(url=api_url, timeout=timeout)
+            result["status_code"] = response.status_code
+            # if the pet id is not found we get a http 404
+            # include any other http codes we want to skip the retry on here
+            if response.status_code not in [404]:
+                response.raise_for_status()
+                response_json = orjson.loads(response.content)
+                result["response"] = response_json
+            logger.info("get_pet_by_id|done")
+            return result
         except httpx.RequestError as err:
-            logger.error(f"get_pet_by_id|RequestError: {err}")
+            logger.error("get_pet_by_id|RequestError: %s", err)
             result["error"] = str(err)
         except httpx.HTTPError as err:
-            logger.error(f"get_pet_by_id|HTTPError: {err}")
+            logger.error("get_pet_by_id|HTTPError: %s", err)
+            result["error"] = str(err)
+        except orjson.JSONDecodeError as err:
+            logger.error("get_pet_by_id|JSONDecodeError: %s", err)
             result["error"] = str(err)
         except Exception as err:
-            logger.error(f"get_pet_by_id|unknown exception: {err}")
+            logger.error("get_pet_by_id|unknown exception: %s", err)
             result["error"] = str(err)
 
         backoff_timer = (2**retry) * 0.5
-        logger.warning(f"get_pet_by_id|retry: {retry} backoff {backoff_timer}")
+        logger.warning("get_pet_by_id|retry: %s backoff %s", retry, backoff_timer)
         await asyncio.sleep(backoff_timer)
 
-    logger.error(f"get_pet_by_id|max retries: {retries}")
+    logger.error("get_pet_by_id|max retries: %s", retries)
     result["error"] = "max_retries"
     return result
 
 
 async def test_get_pet_by_id() -> None:
-    test = await get_pet_by_id("10")
-    print(test)
+    try:
+        test = await get_pet_by_id("10")
+        print(test)
+    finally:
+        await close_client()
 
 
 async def test_get_pets_by_id(concurrent: int = 3) -> None:
@@ -95,78 +146,107 @@ async def test_get_pets_by_id(concurrent: int = 3) -> None:
     # results = await asyncio.gather(*coros, return_exceptions=True)
     # print(results)
 
-    # Run them concurrently, limited by the semaphore, print the results as they come in
+    # Run them concurrently, limited by the semaphore, results kept in input order
     semaphore = asyncio.Semaphore(concurrent)
+    # open the client once and share it with every worker
+    client = get_client()
 
-    async def worker(pet_id: int):
-        async with semaphore:
-            return await get_pet_by_id(str(pet_id))
+    # preallocate so each worker writes its own slot, no list growth
+    all_results: List[Dict[str, Any] | None] = [None] * len(ids)
 
-    coros = [worker(pet_id) for pet_id in ids]
+    async def worker(i: int, pet_id: int):
+        async with semaphore:
+            all_results[i] = await get_pet_by_id(str(pet_id), client=client)
 
-    all_results = []
+    try:
+        await asyncio.gather(*(worker(i, pet_id) for i, pet_id in enumerate(ids)))
+    finally:
+        await close_client()
 
-    for coroutine in asyncio.as_completed(coros):
-        result = await coroutine
+    for result in all_results:
         print(result)
-
-        # store for later
-        all_results.append(result)
     # print the length of the results we got
     print(f"test_get_pets_by_id|got {len(all_results)} pets!")
 
 
+async def _fetch_with_retry(
+    client: httpx.AsyncClient, url: str, timeout: int = 1, retries: int = 3
+) -> dict[str, Any]:
+    """GET `url` and return the json body, retrying with exponential backoff.
+
+    Re-raises the last httpx.HTTPError / orjson.JSONDecodeError once all
+    `retries` attempts fail.
+    """
+    for retry in range(retries):
+        logger.info("_fetch_with_retry|start %s", url)
+        try:
+            response = await client.get(url=url, timeout=timeout)
+            logger.info("_fetch_with_retry|got %s", url)
+            # log any non 200 status
+            if response.status_code != 200:
+                logger.warning(
+                    "_fetch_with_retry|url %s status %s", url, response.status_code
+                )
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as err:
+            logger.error("_fetch_with_retry|%s: %s", type(err).__name__, err)
+            if retry == retries - 1:
+                raise
+
+        backoff_timer = (2**retry) * 0.5
+        logger.warning("_fetch_with_retry|retry: %s backoff %s", retry, backoff_timer)
+        await asyncio.sleep(backoff_timer)
+
+
 async def get_all_starwars_people(
     timeout: int = 1, retries: int = 3, max_calls: int = 500
 ) -> List[Dict[str, Any]]:
     """
     Docstring for get_all_starwars_people
 
+    walks every page of https://swapi.dev/api/people/, `max_calls` caps the
+    number of pages and retries are handled per page by _fetch_with_retry
+
     curl -X 'GET' \
-        'https://petstore3.swagger.io/api/v3/pet/findByStatus?status=available' \
+        'https://swapi.dev/api/people/' \
         -H 'accept: application/json'
     """
     _url = "https://swapi.dev/api/people/"
     results = []
-    max_count = 0
+    # next free slot in results, it is preallocated from the first page count
+    idx = 0
+    page_count = 0
+    # open the client once outside the pagination loop
+    client = get_client()
     while _url:
-        for retry in range(retries):
-            # exit the while loop on max_calls
-            max_count += 1
-            if max_count > max_calls:
-                raise StopIteration(f"max_calls: {max_calls} exceeded")
-
-            logger.info(f"get_all_starwars_people|start {_url}")
-            try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(url=_url, timeout=timeout)
-                    logger.info(f"get_all_starwars_people|got {_url}")
-                    # log any non 200 status
-                    if response.status_code != 200:
-                        logger.warning(
-                            f"get_all_starwars_people|url {_url} status {response.status_code}"
-                        )
-                    response.raise_for_status()
-
-                    response_json = response.json()
-                    results.extend(response_json.get("results", []))
-                    _url = response_json.get("next", None)
-                    # break out of the retry loop and back up to the while loop
-                    break
-            except httpx.HTTPError as err:
-                logger.error(f"get_all_starwars_people|HTTPError: {err}")
-            except httpx.RequestError as err:
-                logger.error(f"get_all_starwars_people|RequestError: {err}")
-            except Exception as err:
-                logger.error(f"get_all_starwars_people|exception: {err}")
-            logger.info(f"get_all_starwars_people|retry {_url}")
-
+        # exit the while loop on max_calls
+        page_count += 1
+        if page_count > max_calls:
+            raise RuntimeError(f"max_calls: {max_calls} exceeded")
+
+        response_json = await _fetch_with_retry(
+            client=client, url=_url, timeout=timeout, retries=retries
+        )
+        if not results and (total := response_json.get("count")):
+            results = [None] * total
+        page = response_json.get("results", [])
+        # slice assignment still grows the list if count was under reported
+        results[idx : idx + len(page)] = page
+        idx += len(page)
+        _url = response_json.get("next", None)
+
+    # drop unused slots if count was over reported
+    del results[idx:]
     return results
 
 
 async def test_get_all_starwars_people() -> None:
-    test = await get_all_starwars_people()
-    print(test)
+    try:
+        test = await get_all_starwars_people()
+        print(test)
+    finally:
+        await close_client()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,24 @@
+import asyncio
+import gzip
 import random
 from typing import List
 
+import orjson
 import uvicorn
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, Header, HTTPException, status
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 
+try:
+    # optional, serves HTTP/2 (h2c) as well as HTTP/1.1: pip install hypercorn
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+except ImportError:
+    serve = None
+
+_keep_alive_timeout = 30
+
 app = FastAPI()
 security = HTTPBearer()
 
@@ -25,6 +38,50 @@ all_devices = [
     )
     for i in range(1, 201)
 ]
+# all_devices doesnt change after startup, index and dump it once
+# ids are dense (1..200) so a list indexed by id beats a dict lookup
+_max_id = max(d.id for d in all_devices)
+_devices_bytes_arr: list[bytes] = [b""] * (_max_id + 1)
+for _device in all_devices:
+    _devices_bytes_arr[_device.id] = orjson.dumps(_device.model_dump())
+_devices_dumped: list[dict] = [d.model_dump() for d in all_devices]
+
+
+def build_page(page: int, limit: int, skip: int) -> dict:
+    devices = _devices_dumped[skip : skip + limit]
+    next_page = (
+        f"/devices?page={page+1}&limit={limit}" if len(devices) == limit else None
+    )
+    return {
+        "devices": devices,
+        "next_url": next_page,
+        "total": len(all_devices),
+        "page": page,
+    }
+
+
+# page sizes precomputed at startup, any other limit is built per request
+_page_limits = (10, 20, 50, 100)
+# precomputed serialized json page responses keyed on (limit, page)
+_pages_bytes: dict[tuple[int, int], bytes] = {}
+# the same pages gzipped once at startup, the json is repetitive (DGX-Node-N) and
+# compresses well. single device responses are tiny and go out uncompressed
+_pages_gzip: dict[tuple[int, int], bytes] = {}
+
+
+def build_and_cache(page: int, limit: int) -> bytes:
+    response = build_page(page=page, limit=limit, skip=(page - 1) * limit)
+    response_bytes = orjson.dumps(response)
+    # only the fixed page sizes are cached so query params cant grow the cache
+    if limit in _page_limits and response["devices"]:
+        _pages_bytes[(limit, page)] = response_bytes
+        _pages_gzip[(limit, page)] = gzip.compress(response_bytes)
+    return response_bytes
+
+
+for _limit in _page_limits:
+    for _page in range(1, -(-len(all_devices) // _limit) + 1):
+        build_and_cache(page=_page, limit=_limit)
 
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -39,32 +96,32 @@ def get_devices(
     page: int = 1,
     limit: int = 20,
     skip: int = None,
+    accept_encoding: str | None = Header(default=None),
     credentials: str = Depends(get_current_user),
 ):
-    if skip is None:
-        skip = (page - 1) * limit
-    devices = all_devices[skip : skip + limit]
-    next_page = (
-        f"/devices?page={page+1}&limit={limit}" if len(devices) == limit else None
+    if skip is not None:
+        # arbitrary offsets dont line up with the cached pages
+        return ORJSONResponse(content=build_page(page=page, limit=limit, skip=skip))
+    # already serialized (and compressed), skip the per-request encoding
+    if accept_encoding and "gzip" in accept_encoding and (limit, page) in _pages_gzip:
+        return Response(
+            content=_pages_gzip[(limit, page)],
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return Response(
+        content=_pages_bytes.get((limit, page))
+        or build_and_cache(page=page, limit=limit),
+        media_type="application/json",
     )
-    return {
-        "devices": [
-            {"id": d.id, "provisioning_state": d.provisioning_state, "name": d.name}
-            for d in devices
-        ],
-        "next_url": next_page,
-        "total": len(all_devices),
-        "page": page,
-    }
 
 
 @app.get("/v1/devices/{device_id}")
 def get_device(device_id: int, token: str = Depends(get_current_user)):
-    try:
-        device = next(d for d in all_devices if d.id == device_id)
-        return device.model_dump()  # or device.model_dump() in Pydantic v2
-    except StopIteration:
+    # empty bytes mark a gap in the ids
+    if not 0 < device_id < len(_devices_bytes_arr) or not _devices_bytes_arr[device_id]:
         raise HTTPException(status_code=404, detail=f"Device {device_id} not found")
+    return Response(content=_devices_bytes_arr[device_id], media_type="application/json")
 
 
 @app.get("/v1/health")
@@ -73,4 +130,16 @@ def health():
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    if serve is not None:
+        config = Config()
+        config.bind = ["127.0.0.1:8000"]
+        config.keep_alive_timeout = _keep_alive_timeout
+        asyncio.run(serve(app, config))
+    else:
+        # uvicorn is HTTP/1.1 only, keep the connections open longer for clients that pool
+        uvicorn.run(
+            app,
+            host="127.0.0.1",
+            port=8000,
+            timeout_keep_alive=_keep_alive_timeout,
+        )
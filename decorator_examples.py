@@ -16,32 +16,38 @@ def log_execution(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # setup some logging around the function that will be run
-        logging.info(f"START: {func.__name__} | args: {args} | kwargs: {kwargs}")
+        logging.info("START: %s | args: %s | kwargs: %s", func.__name__, args, kwargs)
         start_time = time.time()
         # run the function
         try:
             # get the result of the function
             result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            # log completed
-            logging.info(
-                f"COMPLETE: {func.__name__} | result: {result} | time: {execution_time}"
-            )
+            # log completed, skip the timing math when INFO is off
+            if logging.getLogger().isEnabledFor(logging.INFO):
+                logging.info(
+                    "COMPLETE: %s | result: %s | time: %s",
+                    func.__name__,
+                    result,
+                    time.time() - start_time,
+                )
             # pass result along
             return result
         except Exception as err:
             # log the exception and re-raise the error
-            logging.error(f"ERROR: {func.__name__} | error: {err}")
+            logging.error("ERROR: %s | error: %s", func.__name__, err)
             raise err
 
     return wrapper
 
 
 ## retry decorator
-def retry_execution(func, retries: int = 3):
+def retry_execution(func=None, *, retries: int = 3):
     """
     A decorator to rety failing functions
+    works bare as @retry_execution or with args as @retry_execution(retries=5)
     """
+    if func is None:
+        return functools.partial(retry_execution, retries=retries)
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
@@ -53,15 +59,51 @@ def retry_execution(func, retries: int = 3):
                 # we dont need to increment the attempts if no exeception was raised
                 return result
             except Exception as err:
-                logging.error(f"retry_execution|retrying attempt: {attempts+1}")
+                logging.error("retry_execution|retrying attempt: %d", attempts + 1)
                 attempts += 1
 
     return wrapper
 
 
+## fused retry + logging decorator
+def instrumented_retry(retries: int = 3):
+    """
+    retry_execution and log_execution in a single wrapper frame
+    only formats the log lines when INFO is enabled, re-raises after the last retry
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(retries + 1):
+                start_time = time.perf_counter_ns()
+                try:
+                    result = func(*args, **kwargs)
+                    if logging.getLogger().isEnabledFor(logging.INFO):
+                        logging.info(
+                            "COMPLETE: %s | result: %s | time: %d ns",
+                            func.__name__,
+                            result,
+                            time.perf_counter_ns() - start_time,
+                        )
+                    return result
+                except Exception as err:
+                    if attempt == retries:
+                        logging.error("ERROR: %s | error: %s", func.__name__, err)
+                        raise
+                    logging.error(
+                        "instrumented_retry|%s retrying attempt: %d",
+                        func.__name__,
+                        attempt + 1,
+                    )
+
+        return wrapper
+
+    return decorator
+
+
 ## function that makes random exceptions lol
-@retry_execution
-@log_execution
+@instrumented_retry()
 def risky_business():
     """
     Runs successfully 50% of the time.
@@ -113,7 +155,7 @@ class math_logging(math):
     def multiply(self) -> int:
         return self.x * self.y
 
-    @log_execution
+    @instrumented_retry()
     def divide(self) -> float:
         return self.x / self.y
 
@@ -129,5 +171,9 @@ if __name__ == "__main__":
 
     ## doing some random exceptions to test the decorators
     for i in range(5):
-        logging.info(f"risky_business: run {i}")
-        risky_business()
+        logging.info("risky_business: run %d", i)
+        try:
+            risky_business()
+        except Exception:
+            # instrumented_retry re-raises once the retries are used up
+            continue
@@ -1,9 +1,9 @@
 import asyncio
 import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
 
-import etcd3  # The standard 'python-etcd3' library
+import aetcd3  # asyncio port of the 'python-etcd3' library
 from aiokafka import AIOKafkaConsumer
 
 # Configure Logging
@@ -13,29 +13,27 @@ logger = logging.getLogger("net-worker")
 
 class AsyncNetworkDeviceLock:
     """
-    Wraps the synchronous etcd3 lock in an asyncio-friendly Context Manager.
-    Runs blocking calls in a separate thread to protect the Event Loop.
+    Wraps the aetcd3 lock in an async Context Manager.
+    The client is native asyncio so the lock calls are awaited directly on the
+    Event Loop, no thread executor hop.
     """
 
     def __init__(self, etcd_client, device_name, ttl=60):
         self.client = etcd_client
         self.lock_name = f"/locks/device/{device_name}"
         self.ttl = ttl
-        self.loop = asyncio.get_running_loop()
         # Create the lock object (this is non-blocking, it just sets up the object)
         self.lock = self.client.lock(self.lock_name, ttl=self.ttl)
         self.is_locked = False
 
     async def __aenter__(self):
-        # Run the blocking .acquire() in a thread executor
         # returns True if acquired, False if not
         logger.info(
-            f"AsyncNetworkDeviceLock|attempting to acquire lock for {self.lock_name}..."
+            "AsyncNetworkDeviceLock|attempting to acquire lock for %s...",
+            self.lock_name,
         )
 
-        acquired = await self.loop.run_in_executor(
-            None, self.lock.acquire  # Uses the default ThreadPoolExecutor
-        )
+        acquired = await self.lock.acquire()
 
         if not acquired:
             raise RuntimeError(
@@ -47,16 +45,76 @@ class AsyncNetworkDeviceLock:
 
     async def __aexit__(self, exc_type, exc, tb):
         if self.is_locked:
-            # Run the blocking .release() in a thread executor
-            await self.loop.run_in_executor(None, self.lock.release)
+            await self.lock.release()
             self.is_locked = False
-            logger.info(f"AsyncNetworkDeviceLock|lock released for {self.lock_name}")
+            logger.info("AsyncNetworkDeviceLock|lock released for %s", self.lock_name)
+
+
+# max messages pulled per poll, different devices in a batch run concurrently
+_batch_size = 32
+
+
+async def process_one(etcd_client, payload):
+    """
+    Runs a single job. Returns (completed, key) where key is the etcd status
+    key to mark COMPLETED, the put is batched by the caller. A job that was
+    already COMPLETED returns (True, None), a locked device (False, None)
+    """
+    job_id = payload["job_id"]
+    device = payload["device"]
+    job_status_key = f"/jobs/{job_id}/status"
+
+    logger.info("process_one|Received Job %s for %s", job_id, device)
+
+    # --- STEP 1: DEDUPLICATION (Zombie Check) ---
+    # aetcd3 returns (value, metadata) tuple
+    current_value, _ = await etcd_client.get(job_status_key)
+
+    if current_value and current_value == b"COMPLETED":
+        logger.warning("process_one|Job %s already marked COMPLETED. Skipping.", job_id)
+        return True, None
+
+    # --- STEP 2: DISTRIBUTED LOCKING ---
+    try:
+        # Use our custom wrapper for the lock lifecycle
+        async with AsyncNetworkDeviceLock(etcd_client, device) as lock:
+
+            # --- STEP 3: THE WORK (Async Scrapli/Netmiko) ---
+            logger.info("process_one|Configuring %s...", device)
+
+            ## !!! This is where your actual async network code goes
+            # Using sleep to simulate SSH latency
+            await asyncio.sleep(2)
+            logger.info("process_one|Job %s finished.", job_id)
+            return True, job_status_key
+
+    except RuntimeError:
+        logger.error("process_one|Device %s is locked. Retrying later.", device)
+        # Strategy: Pause briefly before next poll to let lock clear
+        await asyncio.sleep(5)
+        return False, None
+
+
+async def process_device_jobs(etcd_client, payloads):
+    """
+    Runs one device's jobs one after another, so jobs in the same batch never
+    wait on each other's device lock. Stops at the first job that doesn't
+    complete, the rest are left for redelivery.
+    Returns {job_id: status key or None} for the completed jobs
+    """
+    done = {}
+    for payload in payloads:
+        completed, job_status_key = await process_one(etcd_client, payload)
+        if not completed:
+            break
+        done[payload["job_id"]] = job_status_key
+    return done
 
 
 async def process_jobs():
-    # 1. Setup Sync ETCD Client
-    # We create it once. It uses gRPC under the hood.
-    etcd_client = etcd3.client(host="localhost", port=2379)
+    # 1. Setup Async ETCD Client
+    # We create it once. It uses gRPC under the hood, many RPCs share one HTTP/2 connection.
+    etcd_client = aetcd3.client(host="localhost", port=2379)
 
     # 2. Setup Async Kafka Consumer
     consumer = AIOKafkaConsumer(
@@ -64,71 +122,77 @@ async def process_jobs():
         bootstrap_servers="localhost:9092",
         group_id="net-automation-group",
         enable_auto_commit=False,
-        max_poll_records=1,
+        max_poll_records=_batch_size,
         max_poll_interval_ms=600000,
     )
 
     await consumer.start()
-    loop = asyncio.get_running_loop()
 
     try:
-        async for msg in consumer:
-            payload = json.loads(msg.value)
-            job_id = payload["job_id"]
-            device = payload["device"]
-            job_status_key = f"/jobs/{job_id}/status"
-
-            logger.info(f"process_jobs|Received Job {job_id} for {device}")
-
-            # --- STEP 1: DEDUPLICATION (Zombie Check) ---
-            # We must wrap the blocking 'get' call
-            # etcd3 returns (value, metadata) tuple
-            def check_status():
-                return etcd_client.get(job_status_key)
-
-            current_value, _ = await loop.run_in_executor(None, check_status)
-
-            if current_value and current_value == b"COMPLETED":
-                logger.warning(
-                    f"process_jobs|Job {job_id} already marked COMPLETED. Skipping."
-                )
-                await consumer.commit()
+        while True:
+            batch = await consumer.getmany(timeout_ms=200, max_records=_batch_size)
+            if not batch:
                 continue
 
-            # --- STEP 2: DISTRIBUTED LOCKING ---
-            try:
-                # Use our custom wrapper to keep the loop non-blocking
-                async with AsyncNetworkDeviceLock(etcd_client, device) as lock:
-
-                    # --- STEP 3: THE WORK (Async Scrapli/Netmiko) ---
-                    logger.info(f"process_jobs|Configuring {device}...")
-
-                    ## !!! This is where your actual async network code goes
-                    # Using sleep to simulate SSH latency
-                    await asyncio.sleep(2)
-
-                    # --- STEP 4: MARK COMPLETE ---
-                    # Wrap the blocking 'put' call
-                    def mark_complete():
-                        etcd_client.put(job_status_key, "COMPLETED")
-
-                    await loop.run_in_executor(None, mark_complete)
-                    logger.info(f"process_jobs|Job {job_id} finished.")
-
-                # --- STEP 5: COMMIT OFFSET ---
-                # AIOKafka is native async, so we just await it directly
-                await consumer.commit()
-                logger.info(f"process_jobs|msg {msg.offset} committed.")
+            # group the batch by device, in offset order. a job_id seen twice in
+            # the batch only runs once, the copy shares the first run's outcome
+            job_ids = {}
+            device_jobs = defaultdict(list)
+            seen = set()
+            for tp, msgs in batch.items():
+                job_ids[tp] = []
+                for msg in msgs:
+                    payload = json.loads(msg.value)
+                    job_ids[tp].append(payload["job_id"])
+                    if payload["job_id"] not in seen:
+                        seen.add(payload["job_id"])
+                        device_jobs[payload["device"]].append(payload)
+
+            # devices run concurrently, each device's jobs run in order
+            done = {}
+            results = await asyncio.gather(
+                *(
+                    process_device_jobs(etcd_client, jobs)
+                    for jobs in device_jobs.values()
+                )
+            )
+            for device_done in results:
+                done.update(device_done)
+
+            # --- STEP 4: MARK COMPLETE ---
+            # one etcd txn for the whole batch instead of a put per job
+            done_keys = [key for key in done.values() if key]
+            if done_keys:
+                await etcd_client.transaction(
+                    compare=[],
+                    success=[
+                        etcd_client.transactions.put(key, "COMPLETED")
+                        for key in done_keys
+                    ],
+                    failure=[],
+                )
 
-            except RuntimeError:
-                logger.error(f"process_jobs|Device {device} is locked. Retrying later.")
-                # Strategy: Pause briefly before next poll to let lock clear
-                await asyncio.sleep(5)
+            # --- STEP 5: COMMIT OFFSET ---
+            # per partition, commit only up to the first job that didn't complete
+            # and rewind there so it is fetched again. jobs after it that did
+            # complete are skipped by the zombie check on redelivery
+            offsets = {}
+            for tp, msgs in batch.items():
+                offsets[tp] = msgs[-1].offset + 1
+                for msg, job_id in zip(msgs, job_ids[tp]):
+                    if job_id not in done:
+                        offsets[tp] = msg.offset
+                        consumer.seek(tp, msg.offset)
+                        break
+            # AIOKafka is native async so we just await it
+            await consumer.commit(offsets)
+            logger.info(
+                "process_jobs|batch of %d jobs, %d completed.", len(seen), len(done)
+            )
 
     finally:
         await consumer.stop()
-        # etcd3 client doesn't explicitly need close() usually, but good practice if wrapper supports it
-        # etcd_client.close()
+        await etcd_client.close()
 
 
 if __name__ == "__main__":
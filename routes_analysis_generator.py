@@ -18,24 +18,196 @@ bgpkit-parser rib.20250701.0000.bz2 > all_routes.txt
 import cProfile
 import ipaddress
 import logging
+import mmap
 import os
 import re
 import tracemalloc
-from typing import Generator, List
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Generator, Iterable, List, Tuple
+
+try:
+    # optional, vectorized DFA scan: pip install hyperscan
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    # optional, compiled scan loop for when hyperscan isnt available: pip install numba
+    import numpy as np
+    from numba import njit
+except ImportError:
+    njit = None
 
 # Ensure we find the file relative to this script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 routes_file = os.path.join(script_dir, "all_routes.txt")
 
 
-def stream_route_data(filepath: str) -> Generator[str, None, None]:
+def find_line_spans(
+    mm: mmap.mmap, search: bytes = b""
+) -> Generator[Tuple[int, int], None, None]:
+    """
+    Yields (start, end) offsets of the lines in `mm` containing `search`,
+    every line if `search` is empty. Jumps straight to each match with
+    mm.find instead of walking every line
+    """
+    size = len(mm)
+    pos = 0
+    while pos < size:
+        if search:
+            hit = mm.find(search, pos)
+            if hit == -1:
+                break
+            # back up to the start of the line holding the match
+            pos = mm.rfind(b"\n", pos, hit) + 1 or pos
+        end = mm.find(b"\n", pos)
+        if end == -1:
+            end = size
+        yield pos, end
+        pos = end + 1
+
+
+# bytes handed to hyperscan / numba per scan call, keeps the span lists small
+# so stream_route_data still streams instead of collecting every match first
+_scan_window_size = 8 * 1024 * 1024
+
+
+def window_bounds(
+    mm: mmap.mmap, window_size: int = _scan_window_size
+) -> Generator[Tuple[int, int], None, None]:
+    """
+    Yields (start, end) windows over `mm` of about `window_size` bytes, each
+    end pushed forward to just past the next newline so no line is split
+    """
+    size = len(mm)
+    start = 0
+    while start < size:
+        end = start + window_size
+        if end >= size:
+            end = size
+        else:
+            nl = mm.find(b"\n", end)
+            end = size if nl == -1 else nl + 1
+        yield start, end
+        start = end
+
+
+def hyperscan_line_spans(
+    mm: mmap.mmap, search: bytes
+) -> Generator[Tuple[int, int], None, None]:
+    """
+    Same as find_line_spans but each window of the mmap is handed to hyperscan
+    in one scan call, the match callback maps each hit back to its line
+    """
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[re.escape(search)],
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST],
+    )
+
+    def on_match(id, from_, to, flags, context):
+        window, spans = context
+        # several hits on the same line only report the line once
+        if spans and from_ < spans[-1][1]:
+            return
+        line_start = window.rfind(b"\n", 0, from_) + 1
+        line_end = window.find(b"\n", to)
+        spans.append((line_start, line_end if line_end != -1 else len(window)))
+
+    def scan_window(window: bytes) -> List[Tuple[int, int]]:
+        # the window copy only lives for this call, freed before any yield
+        spans = []
+        db.scan(window, match_event_handler=on_match, context=(window, spans))
+        return spans
+
+    for start, end in window_bounds(mm):
+        for line_start, line_end in scan_window(mm[start:end]):
+            yield start + line_start, start + line_end
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _numba_scan(buf, needle):
+        """
+        Compiled loop over the raw bytes, returns (start, end) of every line
+        containing `needle` in one call instead of a python step per match
+        """
+        n = buf.shape[0]
+        m = needle.shape[0]
+        first = needle[0]
+        spans = []
+        line_start = 0
+        i = 0
+        while i < n:
+            c = buf[i]
+            if c == 10:
+                line_start = i + 1
+            elif c == first and i + m <= n:
+                j = 1
+                while j < m and buf[i + j] == needle[j]:
+                    j += 1
+                if j == m:
+                    # match, skip to the end of this line
+                    k = i + m
+                    while k < n and buf[k] != 10:
+                        k += 1
+                    spans.append((line_start, k))
+                    line_start = k + 1
+                    i = k
+            i += 1
+        return spans
+
+
+def numba_line_spans(
+    mm: mmap.mmap, search: bytes
+) -> Generator[Tuple[int, int], None, None]:
+    """
+    Same as find_line_spans but each window of the mmap is scanned by the
+    numba compiled _numba_scan
+    """
+    needle = np.frombuffer(search, dtype=np.uint8)
+    for start, end in window_bounds(mm):
+        # zero copy view of just this window
+        buf = np.frombuffer(mm, dtype=np.uint8, count=end - start, offset=start)
+        spans = _numba_scan(buf, needle)
+        # drop the view before yielding, the mmap cant be closed while it is alive
+        del buf
+        for line_start, line_end in spans:
+            yield start + line_start, start + line_end
+
+
+def line_spans(mm: mmap.mmap, search: bytes = b"") -> Iterable[Tuple[int, int]]:
+    """
+    Picks hyperscan when it is installed and there is a search, then numba,
+    else mm.find
+    """
+    if search and hyperscan is not None:
+        return hyperscan_line_spans(mm, search)
+    if search and njit is not None:
+        return numba_line_spans(mm, search)
+    return find_line_spans(mm, search)
+
+
+def stream_route_data(
+    filepath: str, search: bytes = b""
+) -> Generator[bytes, None, None]:
     """
     A generator that streams lines from a BGP RIB file
+
+    The file is mmapped and scanned as raw bytes, no per line str decode.
+    If `search` is set only the lines containing it are yielded, using
+    hyperscan or numba when installed and mm.find otherwise
     """
     try:
-        with open(filepath) as fin:
-            for line in fin:
-                yield line.strip()
+        with open(filepath, "rb") as fin:
+            # mmap cant map an empty file
+            if os.fstat(fin.fileno()).st_size == 0:
+                return
+            with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start, end in line_spans(mm, search):
+                    yield mm[start:end].strip()
     except FileNotFoundError:
         logging.error(f"couldnt open file: {filepath}")
     except Exception as err:
@@ -49,9 +221,9 @@ def search_routes_for_loop(search: str) -> List[str]:
 
     logging.info(f"search_routes_for_loop|starting")
     result = []
-    for line in stream_route_data(filepath=routes_file):
-        if search in line:
-            result.append(line)
+    # encode once, the scan runs on bytes and only matching lines get decoded
+    for line in stream_route_data(filepath=routes_file, search=search.encode()):
+        result.append(line.decode())
     return result
 
 
@@ -61,9 +233,72 @@ def search_routes_generator(search: str) -> Generator[str, None, None]:
     """
 
     logging.info(f"search_routes_generator|starting")
-    for line in stream_route_data(filepath=routes_file):
-        if search in line:
-            yield line
+    for line in stream_route_data(filepath=routes_file, search=search.encode()):
+        yield line.decode()
+
+
+def chunk_route_file(filepath: str, chunks: int) -> List[Tuple[int, int]]:
+    """
+    Splits the file into `chunks` byte ranges, each boundary pushed forward
+    to just past the next newline so no line is split between two chunks
+    """
+    with open(filepath, "rb") as fin:
+        size = os.fstat(fin.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = [0]
+            for i in range(1, chunks):
+                nl = mm.find(b"\n", max(i * size // chunks, bounds[-1]))
+                bounds.append(size if nl == -1 else nl + 1)
+            bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def scan_route_chunk(filepath: str, start: int, end: int, search: bytes) -> List[bytes]:
+    """
+    Process pool worker, maps only its own byte range of the file and returns
+    the matching lines
+    """
+    # mmap offsets must be a multiple of the allocation granularity
+    offset = start - start % mmap.ALLOCATIONGRANULARITY
+    skip = start - offset
+    with open(filepath, "rb") as fin:
+        with mmap.mmap(
+            fin.fileno(), end - offset, offset=offset, access=mmap.ACCESS_READ
+        ) as mm:
+            # drop any lines before `start` that belong to the previous chunk
+            return [
+                mm[line_start:line_end].strip()
+                for line_start, line_end in line_spans(mm, search)
+                if line_start >= skip
+            ]
+
+
+def search_routes_parallel(
+    search: str, workers: int | None = None
+) -> Generator[str, None, None]:
+    """
+    Example function to process the routes file in parallel, one process per
+    newline aligned chunk. Results are collected per chunk then yielded in
+    file order
+    """
+
+    logging.info(f"search_routes_parallel|starting")
+    workers = workers or os.cpu_count() or 1
+    needle = search.encode()
+    try:
+        chunks = chunk_route_file(filepath=routes_file, chunks=workers)
+    except FileNotFoundError:
+        logging.error(f"couldnt open file: {routes_file}")
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(scan_route_chunk, routes_file, start, end, needle)
+            for start, end in chunks
+        ]
+        for line in chain.from_iterable(future.result() for future in futures):
+            yield line.decode()
 
 
 def extract_ips_generator(
@@ -108,6 +343,10 @@ if __name__ == "__main__":
     # Note: we need to consume the generator for the code to actually execute inside
     cProfile.run('[x for x in search_routes_generator(search="36351")]')
 
+    print("\n--- cProfile: search_routes_parallel ---")
+    # profile the process pool version, cProfile only sees the parent process
+    cProfile.run('[x for x in search_routes_parallel(search="36351")]')
+
     print("\n=== Memory Profiling (tracemalloc) ===")
 
     print("\n--- Testing search_routes_for_loop (List) ---")